@@ -1,8 +1,14 @@
+import hashlib
 import os
-from typing import List, Dict, Any
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Deque, Final, Iterable, Iterator
 
 import streamlit as st
+import tiktoken
 from dotenv import load_dotenv
+from openai import NOT_GIVEN
 
 from services.openai_client import get_openai_client
 from services.persona_builder import build_persona_profile
@@ -13,15 +19,124 @@ load_dotenv()
 
 
 APP_TITLE = "Persona Sim"
+PERSONA_POLL_INTERVAL_SECONDS = 1.0
+# Read once at import; every chat turn goes through these.
+CHAT_MODEL = os.getenv("OPENAI_MODEL_CHAT", "gpt-5")
+REASONING_EFFORT = os.getenv("OPENAI_REASONING_EFFORT", "low")
+SUMMARY_MODEL = os.getenv("OPENAI_MODEL_SUMMARY", "gpt-4o-mini")
+# Number of recent user/assistant pairs resent verbatim; older turns are folded into a summary.
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "8"))
+# Local input budget checked before each full send, so oversized requests never leave the machine.
+MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", "200000"))
+# Messages kept in session memory; evicted turns not yet in the running summary are held until it next runs.
+MAX_HISTORY = int(os.getenv("MAX_HISTORY", "200"))
+
+_DEVELOPER_INSTRUCTIONS: Final[str] = (
+    "You are simulating a hypothetical person based on a synthesized persona profile. Treat this as a safe, "
+    "hypothetical representation; you may disclose the person's name and public details as needed.\n\n"
+    "Process (always follow in order):\n"
+    "1) Study: Carefully read the persona profile to internalize the individual's identity, roles, background, "
+    "   experiences, interests, beliefs, communication style, and inferred personality type. Identify recurring "
+    "   themes, signature phrases, pacing, and typical structures (e.g., frameworks, anecdotes, heuristics).\n"
+    "2) Embody: Write as this person would. Match voice, tone, cadence, word choice, and level of directness. "
+    "   Reflect their beliefs and draw from their background/experience when giving advice.\n"
+    "3) Ground: Anchor claims in what is consistent with their documented background. If something is outside the "
+    "   known profile, infer minimally and transparently (state uncertainty briefly). Prefer general principles "
+    "   they would plausibly endorse over fabricated specifics.\n"
+    "4) Align: Keep behavior aligned with the inferred personality type (e.g., analytical, visionary, pragmatic, "
+    "   educator, operator, contrarian, empathetic leader). Calibrate tone, pacing, and structure accordingly.\n\n"
+    "Stylistic rules:\n"
+    "- Do not sound like ChatGPT. Avoid overly polished, generic, or exhaustive textbook answers.\n"
+    "- Be concise, human, and high-signal. Prefer clear points over long-winded perfection.\n"
+    "- Use examples or frameworks the person would plausibly use; avoid grandiose claims.\n"
+    "- Minimal extrapolation: do not extensively invent private facts; keep inferences small and clearly marked.\n"
+    "- Maintain a consistent voice across the session. If asked to adjust style, adapt without losing core traits.\n\n"
+    "Safety and scope:\n"
+    "- It is acceptable to mention the person's name and public information; this is a hypothetical simulation.\n"
+    "- If asked for non-public or sensitive data, refuse briefly and pivot to safe, public, high-level guidance.\n\n"
+    "Interview mode:\n"
+    "- Expect interview-style prompts (Q&A). Answer with maximum fidelity to the person’s unique experience, "
+    "  beliefs, and track record—not generic best practices.\n"
+    "- Prefer concrete, first-hand framing (what they did, saw, learned) over abstract generalities.\n"
+    "- If the persona lacks direct experience on a topic, be transparent and pivot to the closest adjacent area "
+    "  where they have strong opinions or exposure.\n\n"
+    "Critical reminder (before every answer):\n"
+    "- Silently ask: ‘Given this question, how would this persona respond—and not respond—based on their "
+    "  background, beliefs, and style?’ Then produce the response\n\n"
+    "Output style: concise, person-like, grounded, with uncertainty noted when appropriate."
+)
 
 
 def initialize_session_state() -> None:
-    if "persona_profile" not in st.session_state:
-        st.session_state["persona_profile"] = None
-    if "messages" not in st.session_state:
-        st.session_state["messages"] = []
-    if "persona_name" not in st.session_state:
-        st.session_state["persona_name"] = ""
+    # Runs on every rerun, so guard all defaults behind one membership test.
+    if st.session_state.get("_initialized"):
+        return
+    st.session_state.update(
+        {
+            "persona_profile": None,
+            "messages": new_message_history(),
+            "evicted_count": 0,
+            "evicted_unsummarized": [],
+            "persona_name": "",
+            "persona_cache_key": None,
+            "last_response_id": None,
+            "profile_future": None,
+            "history_summary": "",
+            "summarized_count": 0,
+            "chain_start": 0,
+            "_initialized": True,
+        }
+    )
+
+
+def new_message_history() -> Deque[Dict[str, str]]:
+    return deque(maxlen=MAX_HISTORY)
+
+
+def append_message(messages: Deque[Dict[str, str]], role: str, content: str) -> None:
+    """
+    Appends a chat message, counting evictions so absolute turn offsets stay valid.
+
+    Summaries only run when the chat chain restarts, so a long window or a large batch of
+    questions can evict turns first; those are held in `evicted_unsummarized` until then.
+    """
+    if len(messages) == messages.maxlen:
+        if st.session_state["evicted_count"] >= st.session_state["summarized_count"]:
+            st.session_state["evicted_unsummarized"].append(messages[0])
+        st.session_state["evicted_count"] += 1
+    messages.append({"role": role, "content": content})
+
+
+@st.cache_resource(show_spinner=False)
+def get_executor() -> ThreadPoolExecutor:
+    """Shared worker pool so persona research never blocks the script thread."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="persona")
+
+
+@st.cache_resource(show_spinner=False)
+def get_encoder() -> tiktoken.Encoding:
+    return tiktoken.get_encoding("o200k_base")
+
+
+def trim_to_token_budget(input_messages: List[Dict[str, Any]], keep_head: int) -> List[Dict[str, Any]]:
+    """
+    Drops the oldest history messages until the input fits `MAX_INPUT_TOKENS`.
+
+    The first `keep_head` messages (instructions, profile, summary) and the newest
+    message are always kept.
+    """
+    encoder = get_encoder()
+    counts = [len(encoder.encode(msg["content"])) for msg in input_messages]
+    total = sum(counts)
+    while total > MAX_INPUT_TOKENS and len(input_messages) > keep_head + 1:
+        input_messages.pop(keep_head)
+        total -= counts.pop(keep_head)
+    return input_messages
+
+
+def persona_cache_key(persona_profile: str) -> str:
+    """Stable key that lets OpenAI reuse the cached instructions + profile prefix."""
+    return hashlib.sha256(persona_profile.encode("utf-8")).hexdigest()[:32]
 
 
 def sidebar_persona_form() -> None:
@@ -43,136 +158,279 @@ def sidebar_persona_form() -> None:
             st.sidebar.warning("Please provide at least a name or one source link or additional info.")
             return
 
-        with st.sidebar.status("Researching and synthesizing persona...", expanded=True) as status:
-            try:
-                client = get_openai_client()
-                profile, name = build_persona_profile(
-                    client=client,
-                    full_name=full_name.strip(),
-                    linkedin_url=linkedin_url.strip(),
-                    x_url=x_url.strip(),
-                    additional_info=additional_info.strip(),
-                )
-                st.session_state["persona_profile"] = profile
-                st.session_state["persona_name"] = full_name
-                st.session_state["messages"] = []
-                status.update(label="Persona created successfully.", state="complete")
-            except Exception as e:
-                status.update(label="Failed to create persona.", state="error")
-                st.sidebar.error(f"Error: {e}")
+        st.session_state["profile_future"] = get_executor().submit(
+            build_persona_profile,
+            full_name=full_name.strip(),
+            linkedin_url=linkedin_url.strip(),
+            x_url=x_url.strip(),
+            additional_info=additional_info.strip(),
+        )
+        st.session_state["pending_persona_name"] = full_name
 
+    future = st.session_state["profile_future"]
+    if future is None:
+        return
+    if not future.done():
+        with st.sidebar:
+            persona_build_status()
+        return
 
+    st.session_state["profile_future"] = None
+    with st.sidebar.status("Researching and synthesizing persona...", expanded=True) as status:
+        try:
+            profile, name = future.result()
+            st.session_state["persona_profile"] = profile
+            st.session_state["persona_name"] = st.session_state.pop("pending_persona_name", name)
+            st.session_state["persona_cache_key"] = persona_cache_key(profile)
+            st.session_state["last_response_id"] = None
+            st.session_state["history_summary"] = ""
+            st.session_state["summarized_count"] = 0
+            st.session_state["chain_start"] = 0
+            st.session_state["evicted_count"] = 0
+            st.session_state["evicted_unsummarized"] = []
+            st.session_state["messages"] = new_message_history()
+            status.update(label="Persona created successfully.", state="complete")
+        except Exception as e:
+            status.update(label="Failed to create persona.", state="error")
+            st.sidebar.error(f"Error: {e}")
+
+
+# Polls the background build by rerunning only this status element; once the build is done,
+# one full rerun lets sidebar_persona_form pick up the result and the chat panel show it.
+@st.experimental_fragment(run_every=PERSONA_POLL_INTERVAL_SECONDS)
+def persona_build_status() -> None:
+    future = st.session_state["profile_future"]
+    if future is not None and future.done():
+        st.rerun()
+    st.status("Researching and synthesizing persona...", state="running")
+
+
+# Chat input reruns only this fragment, not the sidebar or page setup.
+@st.experimental_fragment
 def render_chat_panel() -> None:
     st.title(APP_TITLE)
 
-    if st.session_state.get("persona_profile") is None:
+    profile = st.session_state.get("persona_profile")
+    if profile is None:
         st.info("Create a persona from the sidebar to begin chatting.")
         return
 
     persona_name = st.session_state.get("persona_name") or "Persona"
+    messages = st.session_state["messages"]
     st.subheader(f"Chatting with: {persona_name}")
 
     # Show persona profile expander
     with st.expander("View persona profile", expanded=False):
-        st.markdown(st.session_state["persona_profile"]) 
+        st.markdown(profile)
 
     # Show conversation history
-    for message in st.session_state["messages"]:
+    for message in messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
+    # Interview mode: several questions answered in a single request
+    with st.expander("Ask several questions at once", expanded=False):
+        with st.form("batch_questions_form", clear_on_submit=True):
+            batch_text = st.text_area("One question per line", key="input_batch_questions", height=120)
+            batch_submitted = st.form_submit_button("Ask all")
+    if batch_submitted:
+        questions = [line.strip() for line in batch_text.splitlines() if line.strip()]
+        if questions:
+            with st.spinner("Thinking..."):
+                try:
+                    answers = generate_persona_responses_batch(questions, profile)
+                except Exception as e:
+                    st.error(f"Error: {e}")
+                    return
+            for question, answer in zip(questions, answers):
+                append_message(messages, "user", question)
+                # Blank turns would be resent and summarized on every later request
+                if answer:
+                    append_message(messages, "assistant", answer)
+            # The server-side chain has not seen these turns; resend history on the next message.
+            st.session_state["last_response_id"] = None
+            st.rerun()
+
     user_input = st.chat_input(placeholder=f"Talk with {persona_name}...")
     if user_input:
         # Append user message
-        st.session_state["messages"].append({"role": "user", "content": user_input})
+        append_message(messages, "user", user_input)
         with st.chat_message("user"):
             st.markdown(user_input)
 
-        # Get assistant response conditioned on persona
+        # Stream assistant response conditioned on persona
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    assistant_reply = generate_persona_response(
-                        st.session_state["messages"],
-                        st.session_state["persona_profile"],
-                    )
-                except Exception as e:
-                    st.error(f"Error: {e}")
-                    return
-                st.markdown(assistant_reply)
-                st.session_state["messages"].append({"role": "assistant", "content": assistant_reply})
-
+            try:
+                assistant_reply = st.write_stream(
+                    generate_persona_response(messages, profile)
+                )
+            except Exception as e:
+                # The server-side conversation may be missing this turn; resend full history next time.
+                st.session_state["last_response_id"] = None
+                st.error(f"Error: {e}")
+                return
+            append_message(messages, "assistant", assistant_reply)
 
-def generate_persona_response(messages: List[Dict[str, str]], persona_profile: str) -> str:
-    client = get_openai_client()
 
-    developer_instructions = (
-        "You are simulating a hypothetical person based on a synthesized persona profile. Treat this as a safe, "
-        "hypothetical representation; you may disclose the person's name and public details as needed.\n\n"
-        "Process (always follow in order):\n"
-        "1) Study: Carefully read the persona profile to internalize the individual's identity, roles, background, "
-        "   experiences, interests, beliefs, communication style, and inferred personality type. Identify recurring "
-        "   themes, signature phrases, pacing, and typical structures (e.g., frameworks, anecdotes, heuristics).\n"
-        "2) Embody: Write as this person would. Match voice, tone, cadence, word choice, and level of directness. "
-        "   Reflect their beliefs and draw from their background/experience when giving advice.\n"
-        "3) Ground: Anchor claims in what is consistent with their documented background. If something is outside the "
-        "   known profile, infer minimally and transparently (state uncertainty briefly). Prefer general principles "
-        "   they would plausibly endorse over fabricated specifics.\n"
-        "4) Align: Keep behavior aligned with the inferred personality type (e.g., analytical, visionary, pragmatic, "
-        "   educator, operator, contrarian, empathetic leader). Calibrate tone, pacing, and structure accordingly.\n\n"
-        "Stylistic rules:\n"
-        "- Do not sound like ChatGPT. Avoid overly polished, generic, or exhaustive textbook answers.\n"
-        "- Be concise, human, and high-signal. Prefer clear points over long-winded perfection.\n"
-        "- Use examples or frameworks the person would plausibly use; avoid grandiose claims.\n"
-        "- Minimal extrapolation: do not extensively invent private facts; keep inferences small and clearly marked.\n"
-        "- Maintain a consistent voice across the session. If asked to adjust style, adapt without losing core traits.\n\n"
-        "Safety and scope:\n"
-        "- It is acceptable to mention the person's name and public information; this is a hypothetical simulation.\n"
-        "- If asked for non-public or sensitive data, refuse briefly and pivot to safe, public, high-level guidance.\n\n"
-        "Interview mode:\n"
-        "- Expect interview-style prompts (Q&A). Answer with maximum fidelity to the person’s unique experience, "
-        "  beliefs, and track record—not generic best practices.\n"
-        "- Prefer concrete, first-hand framing (what they did, saw, learned) over abstract generalities.\n"
-        "- If the persona lacks direct experience on a topic, be transparent and pivot to the closest adjacent area "
-        "  where they have strong opinions or exposure.\n\n"
-        "Critical reminder (before every answer):\n"
-        "- Silently ask: ‘Given this question, how would this persona respond—and not respond—based on their "
-        "  background, beliefs, and style?’ Then produce the response\n\n"
-        "Output style: concise, person-like, grounded, with uncertainty noted when appropriate."
-    )
-    
-    # Build the chat inputs: developer instructions + persona profile + conversation
-    input_messages: List[Dict[str, Any]] = [
-        {"role": "developer", "content": developer_instructions},
+def persona_prefix_messages(persona_profile: str) -> List[Dict[str, Any]]:
+    """Developer instructions + persona profile; kept identical across calls so it prompt-caches."""
+    return [
+        {"role": "developer", "content": _DEVELOPER_INSTRUCTIONS},
         {
             "role": "developer",
             "content": (
-                "Persona Profile (redacted):\n\n" + persona_profile +
+                f"Persona Profile (redacted):\n\n{persona_profile}"
                 "\n\nOperate as this hypothetical person in style and perspective."
             ),
         },
     ]
 
-    # Append conversation history
-    for msg in messages:
-        input_messages.append({"role": msg["role"], "content": msg["content"]})
 
+def generate_persona_response(messages: Iterable[Dict[str, str]], persona_profile: str) -> Iterator[str]:
+    """
+    Yields the persona's reply as text deltas while the model generates it.
+
+    Follow-up turns chain onto the previous response via `previous_response_id`, so only
+    the newest user message is sent. Every `HISTORY_WINDOW_TURNS` turns the chain is
+    restarted with the full prefix, a summary of older turns, and the recent window, which
+    keeps the server-side context bounded for long interviews.
+
+    `summarized_count` and `chain_start` count messages from the start of the session,
+    including ones already evicted from the bounded history.
+    """
+    client = get_openai_client()
+    window = 2 * HISTORY_WINDOW_TURNS
+    messages = list(messages)
+    evicted_count = st.session_state.get("evicted_count", 0)
+    message_count = evicted_count + len(messages)
+    previous_response_id = st.session_state.get("last_response_id")
+    if previous_response_id and message_count - st.session_state.get("chain_start", 0) >= window:
+        previous_response_id = None
+
+    input_messages: List[Dict[str, Any]]
+    if previous_response_id:
+        input_messages = [{"role": msg["role"], "content": msg["content"]} for msg in messages[-1:]]
+    else:
+        # Build the chat inputs: developer instructions + persona profile + conversation
+        input_messages = persona_prefix_messages(persona_profile)
+
+        if message_count > window:
+            dropped = messages[:-window]
+            summarized_count = st.session_state.get("summarized_count", 0)
+            if evicted_count + len(dropped) > summarized_count:
+                evicted_unsummarized = st.session_state["evicted_unsummarized"]
+                st.session_state["history_summary"] = summarize_history(
+                    evicted_unsummarized + dropped[max(0, summarized_count - evicted_count):],
+                    st.session_state.get("history_summary", ""),
+                )
+                st.session_state["summarized_count"] = evicted_count + len(dropped)
+                evicted_unsummarized.clear()
+            input_messages.append(
+                {
+                    "role": "developer",
+                    "content": f"Summary of earlier conversation: {st.session_state['history_summary']}",
+                }
+            )
+            messages = messages[-window:]
+
+        # Append conversation history
+        keep_head = len(input_messages)
+        for msg in messages:
+            input_messages.append({"role": msg["role"], "content": msg["content"]})
+        input_messages = trim_to_token_budget(input_messages, keep_head)
+        st.session_state["chain_start"] = message_count
+
+    # Only a completed turn may be chained onto; an interrupted stream (error, or a rerun/stop
+    # from a new message) leaves this unset so the next turn resends the full history.
+    st.session_state["last_response_id"] = None
+    with client.responses.stream(
+        model=CHAT_MODEL,
+        reasoning={"effort": REASONING_EFFORT},
+        input=input_messages,
+        previous_response_id=previous_response_id or NOT_GIVEN,
+        prompt_cache_key=st.session_state.get("persona_cache_key") or persona_cache_key(persona_profile),
+    ) as stream:
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+            elif event.type == "response.completed":
+                st.session_state["last_response_id"] = event.response.id
+
+
+# `### Q1`, `**Q1:**`, `**Q1**:` or `Q1:` at the start of a line; the rest of the line is answer text.
+_ANSWER_MARKER = re.compile(
+    r"^[ \t]*(?:#{1,6}[ \t]*)?(?:\*\*)?Q(\d+)\b[ \t]*[:.)-]?[ \t]*(?:\*\*)?[ \t]*[:.)-]?[ \t]*",
+    re.MULTILINE,
+)
+
+
+def generate_persona_responses_batch(questions: List[str], persona_profile: str) -> List[str]:
+    """
+    Answers several questions as the persona in one request.
+
+    The model prefixes each answer with `### Q<i>` (`**Q<i>:**` and `Q<i>:` are accepted too);
+    answers are split back out client-side. Missing answers come back as empty strings so the
+    result always lines up with `questions`. If no marker parses at all, the whole reply is
+    returned as the first answer rather than discarded.
+    """
+    client = get_openai_client()
+    numbered = "\n".join(f"Q{i}: {question}" for i, question in enumerate(questions, 1))
+    input_messages = persona_prefix_messages(persona_profile) + [
+        {
+            "role": "developer",
+            "content": (
+                "Answer each numbered question below as the persona, independently and in order. "
+                "Start each answer on its own line with `### Q<i>` (e.g. `### Q1`) and add nothing else."
+            ),
+        },
+        {"role": "user", "content": numbered},
+    ]
     response = client.responses.create(
-        model=os.getenv("OPENAI_MODEL_CHAT", "gpt-5"),
-        reasoning={"effort": os.getenv("OPENAI_REASONING_EFFORT", "low")},
+        model=CHAT_MODEL,
+        reasoning={"effort": REASONING_EFFORT},
         input=input_messages,
+        prompt_cache_key=st.session_state.get("persona_cache_key") or persona_cache_key(persona_profile),
     )
+    output_text = getattr(response, "output_text", "") or ""
+
+    parts = _ANSWER_MARKER.split(output_text)
+    answers: Dict[int, str] = {}
+    for number, body in zip(parts[1::2], parts[2::2]):
+        answers[int(number)] = body.strip()
+    if not answers:
+        return [output_text.strip()] + [""] * (len(questions) - 1)
+    return [answers.get(i, "") for i in range(1, len(questions) + 1)]
 
+
+def summarize_history(messages: List[Dict[str, str]], previous_summary: str) -> str:
+    """Folds older turns into a running summary using a small, cheap model."""
+    client = get_openai_client()
+    transcript = "".join(f"{msg['role']}: {msg['content']}\n" for msg in messages)
+    response = client.responses.create(
+        model=SUMMARY_MODEL,
+        input=[
+            {
+                "role": "developer",
+                "content": (
+                    "Update the running summary of an interview with a simulated persona. Keep facts, "
+                    "commitments, opinions the persona expressed, and open threads; drop pleasantries. "
+                    "Reply with the updated summary only."
+                ),
+            },
+            {
+                "role": "user",
+                "content": f"Current summary:\n{previous_summary or 'None'}\n\nNew turns:\n{transcript}",
+            },
+        ],
+    )
     return getattr(response, "output_text", "") or ""
 
 
-def build_transcript_text(messages: List[Dict[str, str]], persona_name: str) -> str:
+def build_transcript_text(messages: Iterable[Dict[str, str]], persona_name: str) -> str:
     header = f"Conversation with {persona_name}\n{'=' * (18 + len(persona_name))}\n\n"
-    lines: List[str] = [header]
-    for msg in messages:
-        role = "You" if msg["role"] == "user" else "Persona"
-        lines.append(f"{role}: {msg['content']}\n")
-    return "".join(lines)
+    return header + "".join(
+        f"{'You' if msg['role'] == 'user' else 'Persona'}: {msg['content']}\n" for msg in messages
+    )
 
 
 def main() -> None:
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, List, Tuple
+
+from openai import AsyncOpenAI
+
+from services import llm_cache
+from services.openai_batch import run_batch
+from services.openai_client import get_openai_client
+
+
+# Shared by the prompt compression scripts, which raise this logger's level themselves.
+logger = logging.getLogger("compression_test")
+
+
+def _model() -> str:
+    return os.getenv("OPENAI_MODEL_CHAT", "gpt-5")
+
+
+def _reasoning_effort() -> str:
+    return os.getenv("OPENAI_REASONING_EFFORT", "low")
+
+
+def truncate(text: str, limit: int = 500) -> str:
+    """Shorten text for display, returning it unchanged when it already fits."""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+async def call_openai_api(prompt: str, client: AsyncOpenAI, semaphore: asyncio.Semaphore) -> str:
+    """Call OpenAI API with the given prompt, at most OPENAI_CONCURRENCY at a time."""
+    model = _model()
+    effort = _reasoning_effort()
+    key = llm_cache.cache_key(model, effort, prompt)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async with semaphore:
+        try:
+            response = await client.responses.create(
+                model=model,
+                reasoning={"effort": effort},
+                input=[{"role": "user", "content": prompt}],
+            )
+        except Exception as e:
+            return f"Error calling OpenAI API: {e}"
+    output_text = getattr(response, "output_text", "") or ""
+    llm_cache.put(key, output_text)
+    return output_text
+
+
+async def stream_pair_responses(
+    client: AsyncOpenAI, pairs: List[Tuple[str, str]]
+) -> AsyncIterator[Tuple[int, str, str]]:
+    """
+    Yields (index, original_output, compressed_output) for each prompt pair as soon as both
+    of its responses arrive, and closes `client` when done.
+
+    Pairs are sent concurrently and yielded in completion order. With OPENAI_USE_BATCH=1 every
+    prompt goes into one Batch API job instead, so all pairs are yielded once it finishes.
+    Failures come back as "Error calling OpenAI API: ..." strings either way.
+    """
+    async with client:
+        if os.getenv("OPENAI_USE_BATCH") == "1":
+            prompts = [prompt for pair in pairs for prompt in pair]
+            logger.info(f"Submitting {len(prompts)} prompts to the OpenAI Batch API (may take up to 24h)...")
+            try:
+                outputs = run_batch(
+                    get_openai_client(),
+                    prompts,
+                    model=_model(),
+                    reasoning_effort=_reasoning_effort(),
+                )
+            except Exception as e:
+                outputs = [f"Error calling OpenAI API: {e}"] * len(prompts)
+            for i in range(len(pairs)):
+                yield i, outputs[2 * i], outputs[2 * i + 1]
+            return
+
+        logger.info(f"Calling OpenAI API with {2 * len(pairs)} prompts concurrently...")
+        semaphore = asyncio.Semaphore(int(os.getenv("OPENAI_CONCURRENCY", "4")))
+
+        async def answer_pair(i: int, original: str, compressed: str) -> Tuple[int, str, str]:
+            original_output, compressed_output = await asyncio.gather(
+                call_openai_api(original, client, semaphore),
+                call_openai_api(compressed, client, semaphore),
+            )
+            return i, original_output, compressed_output
+
+        for pair_done in asyncio.as_completed([answer_pair(i, *pair) for i, pair in enumerate(pairs)]):
+            yield await pair_done
@@ -0,0 +1,35 @@
+import hashlib
+import logging
+import os
+import shelve
+from typing import Optional
+
+
+# Local response cache for the offline harness scripts; delete the files to start fresh.
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache")
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(model: str, reasoning_effort: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}|{reasoning_effort}|{prompt}".encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[str]:
+    """Returns the cached output, or None on a miss or when the cache can't be read."""
+    try:
+        with shelve.open(CACHE_PATH) as db:
+            return db.get(key)
+    except Exception as e:
+        # A locked (e.g. another run holds the write lock) or corrupt DB is just a miss
+        logger.warning(f"LLM cache read failed, treating as a miss: {e}")
+        return None
+
+
+def put(key: str, value: str) -> None:
+    """Stores an output; a cache that can't be written is logged and skipped."""
+    try:
+        with shelve.open(CACHE_PATH) as db:
+            db[key] = value
+    except Exception as e:
+        logger.warning(f"LLM cache write failed, result not cached: {e}")
@@ -0,0 +1,91 @@
+import os
+import time
+from typing import Any, Dict, List
+
+import orjson
+from openai import OpenAI
+
+from services import llm_cache
+
+
+BATCH_POLL_INTERVAL_SECONDS = float(os.getenv("OPENAI_BATCH_POLL_SECONDS", "30"))
+_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _output_text(body: Dict[str, Any]) -> str:
+    """Concatenates the output_text parts of a raw Responses API body."""
+    return "".join(
+        part.get("text", "")
+        for item in body.get("output") or []
+        if item.get("type") == "message"
+        for part in item.get("content") or []
+        if part.get("type") == "output_text"
+    )
+
+
+def run_batch(client: OpenAI, prompts: List[str], model: str, reasoning_effort: str) -> List[str]:
+    """
+    Sends every prompt through the OpenAI Batch API and returns the outputs in order.
+
+    Batches are billed at half price and use a separate rate-limit pool, but may take
+    up to 24h to finish, so this is only meant for offline evaluation runs. Failed
+    requests come back as "Error calling OpenAI API: ..." strings, like the sync path.
+    Prompts already in the local response cache are not resubmitted.
+    """
+    keys = [llm_cache.cache_key(model, reasoning_effort, prompt) for prompt in prompts]
+    cached = [llm_cache.get(key) for key in keys]
+    pending = [i for i, output in enumerate(cached) if output is None]
+    if not pending:
+        return [output for output in cached if output is not None]
+
+    lines = [
+        orjson.dumps(
+            {
+                "custom_id": f"prompt-{i}",
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": {
+                    "model": model,
+                    "reasoning": {"effort": reasoning_effort},
+                    "input": [{"role": "user", "content": prompts[i]}],
+                },
+            }
+        )
+        for i in pending
+    ]
+    batch_file = client.files.create(
+        file=("batch_input.jsonl", b"\n".join(lines)),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h",
+    )
+
+    while batch.status not in _TERMINAL_STATUSES:
+        time.sleep(BATCH_POLL_INTERVAL_SECONDS)
+        batch = client.batches.retrieve(batch.id)
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'")
+
+    outputs = [
+        output if output is not None else "Error calling OpenAI API: no result returned"
+        for output in cached
+    ]
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).content.splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            index = int(record["custom_id"].rsplit("-", 1)[1])
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                outputs[index] = _output_text(response.get("body") or {})
+                llm_cache.put(keys[index], outputs[index])
+            else:
+                error = record.get("error") or (response.get("body") or {}).get("error")
+                outputs[index] = f"Error calling OpenAI API: {error}"
+    return outputs
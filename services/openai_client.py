@@ -1,8 +1,9 @@
 import os
-from functools import lru_cache
 
+import httpx
+import streamlit as st
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultHttpxClient, OpenAI
 
 
 load_dotenv()
@@ -12,8 +13,7 @@ class MissingAPIKeyError(RuntimeError):
     pass
 
 
-@lru_cache(maxsize=1)
-def get_openai_client() -> OpenAI:
+def _require_api_key() -> None:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise MissingAPIKeyError(
@@ -21,6 +21,32 @@ def get_openai_client() -> OpenAI:
         )
     # The OpenAI SDK reads the env var internally too; setting ensures clarity.
     os.environ["OPENAI_API_KEY"] = api_key
-    return OpenAI()
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client() -> OpenAI:
+    _require_api_key()
+    # One client per process: every session shares its HTTP connection pool, sized for
+    # concurrent sessions and multiplexed over HTTP/2 to avoid repeated TLS handshakes.
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0),
+        http2=True,
+    )
+    return OpenAI(
+        max_retries=2,
+        timeout=httpx.Timeout(600.0, connect=10.0),
+        http_client=http_client,
+    )
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Returns a new async client.
+
+    Not cached: an async connection pool is bound to the event loop it first runs on,
+    so create one per `asyncio.run` (ideally as `async with`) and share it within that run.
+    """
+    _require_api_key()
+    return AsyncOpenAI(max_retries=2, timeout=httpx.Timeout(600.0, connect=10.0))
 
 
@@ -1,8 +1,62 @@
-from typing import Tuple
+import os
+import re
+from functools import lru_cache
+from typing import Optional, Pattern, Tuple
+
+import streamlit as st
+
+from services.openai_client import get_openai_client
+
+
+# Set PERSONA_CACHE_PERSIST=disk (or 1/true) to keep built profiles across restarts.
+# Streamlit ignores TTLs on persisted caches, so entries then live until cleared.
+_CACHE_PERSIST = "disk" if os.getenv("PERSONA_CACHE_PERSIST", "").strip().lower() in {"1", "true", "disk"} else None
+_CACHE_TTL_SECONDS = None if _CACHE_PERSIST else 24 * 3600
+_OFFLINE_PROFILE_MODEL = os.getenv("OPENAI_MODEL_PROFILE", "gpt-5-mini")
+
+
+def _normalize_url(url: str) -> str:
+    return url.strip().lower()
+
+
+def _collapse_whitespace(text: str) -> str:
+    return " ".join(text.split())
+
+
+_NAME_SUFFIXES = frozenset({"jr", "sr", "ii", "iii", "iv"})
+
+
+def _capitalized_pattern(part: str) -> str:
+    """Capital first letter, rest in any case, so "JANE" still matches "Jane" and "neil" matches "Neil"."""
+    return re.escape(part[0].upper()) + "(?i:" + re.escape(part[1:]) + ")"
+
+
+@lru_cache(maxsize=64)
+def _name_pattern(full_name: str) -> Optional[Pattern[str]]:
+    """
+    One pass matching the full name, last name, or first name (plus possessive).
+
+    The full name matches in any case. Single names must start with a capital letter, so
+    names that are also common words ("Will", "Grace") don't redact ordinary text.
+    Suffixes such as "Jr." are never picked as the last name.
+    """
+    parts = [part.strip(".,") for part in full_name.split()]
+    parts = [part for part in parts if len(part) > 1]
+    if not parts:
+        return None
+    variants = [r"(?i:" + r"[.,]?\s+".join(re.escape(part) for part in parts) + ")"]
+    names = [part for part in parts if part.lower() not in _NAME_SUFFIXES]
+    if len(names) > 1:
+        variants += [_capitalized_pattern(part) for part in (names[-1], names[0])]
+    return re.compile(r"(?<!\w)(?:" + "|".join(variants) + r")(?!\w)(?:['’]s)?")
+
+
+def redact_name(text: str, full_name: str) -> str:
+    pattern = _name_pattern(full_name)
+    return pattern.sub("[redacted]", text) if pattern else text
 
 
 def build_persona_profile(
-    client,
     full_name: str,
     linkedin_url: str,
     x_url: str,
@@ -14,8 +68,31 @@ def build_persona_profile(
     Uses the Responses API with web-enabled research to synthesize a comprehensive
     persona profile, excluding explicit full-name mentions in the output while
     preserving key background, experience, and behavioral traits.
+
+    Results are cached on the normalized inputs, so resubmitting the same persona
+    skips the research call entirely.
     """
+    return _build_persona_profile_cached(
+        _collapse_whitespace(full_name),
+        _normalize_url(linkedin_url),
+        _normalize_url(x_url),
+        _collapse_whitespace(additional_info),
+    )
 
+
+@st.cache_data(
+    ttl=_CACHE_TTL_SECONDS,
+    max_entries=256,
+    show_spinner=False,
+    persist=_CACHE_PERSIST,
+)
+def _build_persona_profile_cached(
+    full_name: str,
+    linkedin_url: str,
+    x_url: str,
+    additional_info: str,
+) -> Tuple[str, str]:
+    client = get_openai_client()
     research_instructions = (
         "You are researching a real individual based on provided public links and context. Use web search/browsing tools "
         "to gather the most current public information while ensuring identity correctness. Produce a comprehensive, exhaustive "
@@ -34,26 +111,34 @@ def build_persona_profile(
         "Coverage expectations: be precise, attribute when helpful, include concise timelines, avoid filler. Output your report and no other text."
     )
 
+    # Nothing to look up when only free-form notes are given: skip the slow web_search tool
+    # and synthesize with a cheaper model instead.
+    needs_web = bool(full_name or linkedin_url or x_url)
+
     user_prompt = (
         f"Inputs Provided:\n"
         f"- Full name: {full_name or 'N/A'}\n"
         f"- LinkedIn: {linkedin_url or 'N/A'}\n"
         f"- X: {x_url or 'N/A'}\n"
         f"- Additional info: {additional_info or 'N/A'}\n\n"
-        "Please research and synthesize the persona as specified."
+        + (
+            "Please research and synthesize the persona as specified."
+            if needs_web
+            else "Web research is not available; synthesize the persona from the additional info only."
+        )
     )
 
     response = client.responses.create(
-        model="gpt-5",  # web-enabled per user's requirement
+        model="gpt-5" if needs_web else _OFFLINE_PROFILE_MODEL,
         reasoning={"effort": "low"},
-        tools=[{"type": "web_search"}],
+        tools=[{"type": "web_search"}] if needs_web else [],
         input=[
             {"role": "developer", "content": research_instructions},
             {"role": "user", "content": user_prompt},
         ],
     )
 
-    profile_text = getattr(response, "output_text", "").strip()
+    profile_text = redact_name(getattr(response, "output_text", "").strip(), full_name)
 
     return profile_text, full_name
 
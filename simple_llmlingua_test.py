@@ -2,32 +2,54 @@
 """
 Simple LLMLingua test with basic text compression simulation.
 This demonstrates the concept without requiring heavy model downloads.
+Set COMPRESSION_METHOD=surprisal to score tokens with a small local LM instead
+(needs torch + transformers, which llmlingua already pulls in).
 """
 
+import argparse
+import asyncio
+import logging
 import os
-import json
+import time
 from datetime import datetime
-from typing import Dict, Any, List
+from pathlib import Path
+from functools import lru_cache
+from typing import List, Tuple
+import tiktoken
+import orjson
 from dotenv import load_dotenv
-from services.openai_client import get_openai_client
+from services.compression_harness import stream_pair_responses, truncate
+from services.openai_client import get_async_openai_client
+from tests.prompts import TEST_PROMPTS
 
 # Load environment variables
 load_dotenv()
 
+# Progress and summary go to INFO; full prompts and responses only with --verbose (DEBUG)
+logger = logging.getLogger("compression_test")
+
+COMPRESSION_METHOD = os.getenv("COMPRESSION_METHOD", "truncate")
+SURPRISAL_MODEL = os.getenv("SURPRISAL_MODEL", "distilgpt2")
+
+@lru_cache(maxsize=128)
+def split_sentences(text: str) -> Tuple[str, ...]:
+    """Split text into sentences once per distinct text."""
+    return tuple(text.split('. '))
+
+@lru_cache(maxsize=128)
 def simple_text_compression(text: str, target_ratio: float = 0.3) -> str:
     """
     Simple text compression simulation for demonstration.
     In a real scenario, LLMLingua would use ML models for intelligent compression.
     """
     # Split into sentences
-    sentences = text.split('. ')
+    sentences = split_sentences(text)
     
     # Keep only a portion of sentences (simulating compression)
     keep_count = max(1, int(len(sentences) * target_ratio))
-    compressed_sentences = sentences[:keep_count]
     
     # Join back with some truncation
-    compressed_text = '. '.join(compressed_sentences)
+    compressed_text = '. '.join(sentences[:keep_count])
     
     # Add ellipsis to indicate compression
     if len(compressed_text) < len(text) * 0.8:
@@ -35,148 +57,145 @@ def simple_text_compression(text: str, target_ratio: float = 0.3) -> str:
     
     return compressed_text
 
-def create_test_prompts() -> List[Dict[str, str]]:
-    """Create a set of test prompts for compression testing."""
-    return [
-        {
-            "name": "Technical Documentation",
-            "prompt": """
-            Artificial Intelligence (AI) has revolutionized numerous industries and continues to shape the future of technology. 
-            Machine learning algorithms, particularly deep learning neural networks, have enabled breakthroughs in computer vision, 
-            natural language processing, and autonomous systems. These systems require massive amounts of data for training, 
-            sophisticated computational resources, and careful tuning of hyperparameters to achieve optimal performance.
-            
-            The development of transformer architectures has been particularly influential, leading to models like GPT, BERT, 
-            and their successors that can understand and generate human-like text. These models have applications in chatbots, 
-            content generation, translation services, and code assistance tools.
-            
-            However, AI systems also face challenges including bias in training data, interpretability of decisions, 
-            computational costs, and ethical considerations around automation and job displacement. Researchers are actively 
-            working on solutions such as federated learning, explainable AI, and responsible AI frameworks.
-            
-            The future of AI likely involves more efficient models, better integration with human workflows, and continued 
-            advances in areas like reinforcement learning, multimodal AI, and artificial general intelligence research.
-            """
-        },
-        {
-            "name": "Meeting Summary",
-            "prompt": """
-            Meeting Transcript - Product Planning Session
-            Date: December 15, 2024
-            Participants: Sarah (Product Manager), Mike (Engineering Lead), Lisa (Design Lead), Tom (Marketing)
-            
-            Sarah: Good morning everyone. Thanks for joining today's product planning session. We need to discuss the Q1 roadmap 
-            and prioritize features for our mobile app. Mike, can you give us an update on the current development status?
-            
-            Mike: Sure. We've completed the user authentication system and the core navigation framework. The team is currently 
-            working on the payment integration module. We're about 60% complete with that. The main challenge we're facing is 
-            integrating with multiple payment providers while maintaining security standards.
-            
-            Lisa: From a design perspective, we've finalized the wireframes for the main user flows. The design system is 
-            consistent across all screens. We're now focusing on micro-interactions and accessibility features. I'd like to 
-            propose adding haptic feedback for better user experience.
-            
-            Tom: Marketing has been conducting user research and we've identified three key user personas. The primary persona 
-            is millennials aged 25-35 who value convenience and speed. Our secondary persona is small business owners who need 
-            efficient transaction management. We should prioritize features that serve both groups.
-            
-            Sarah: That's helpful context. Based on your inputs, I propose we focus on three key features for Q1: 
-            1) Enhanced payment processing with multiple provider support, 2) Advanced analytics dashboard for business users, 
-            and 3) Push notification system for real-time updates. Mike, what's your timeline estimate for these features?
-            """
-        }
-    ]
+@lru_cache(maxsize=1)
+def load_surprisal_model():
+    """Load the small causal LM used for surprisal scoring (imported lazily; it is heavy)."""
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    
+    tokenizer = AutoTokenizer.from_pretrained(SURPRISAL_MODEL)
+    if tokenizer.pad_token is None:
+        # GPT-style tokenizers have no pad token; right-padding with EOS is masked out anyway
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "right"
+    model = AutoModelForCausalLM.from_pretrained(SURPRISAL_MODEL).eval()
+    return tokenizer, model
+
+def surprisal_compress_batch(
+    texts: List[str], target_ratio: float = 0.3, n_head: int = 32, n_tail: int = 32
+) -> List[str]:
+    """
+    Keep the most informative tokens instead of a prefix of sentences.
+    Each token is scored by its surprisal (-log p) under a small LM; the first n_head and
+    last n_tail tokens are always kept and the top-scoring tokens in between fill the budget.
+    All texts are scored together in one padded forward pass.
+    """
+    import torch
+    
+    tokenizer, model = load_surprisal_model()
+    max_length = model.config.max_position_embeddings
+    lengths = [len(ids) for ids in tokenizer(texts).input_ids]
+    # Texts longer than the scorer's context window fall back to the cheap path
+    scored = [i for i, length in enumerate(lengths) if length <= max_length]
+    results = [simple_text_compression(text, target_ratio) for text in texts]
+    if not scored:
+        return results
+    
+    encoded = tokenizer([texts[i] for i in scored], padding=True, return_tensors="pt")
+    with torch.inference_mode():
+        logits = model(**encoded).logits
+    # Surprisal of token t given tokens < t; the first token has no context to score it
+    log_probs = torch.log_softmax(logits[:, :-1], dim=-1)
+    surprisal = -log_probs.gather(-1, encoded.input_ids[:, 1:].unsqueeze(-1)).squeeze(-1)
+    
+    for row, i in enumerate(scored):
+        length = lengths[i]
+        keep_count = max(1, int(length * target_ratio))
+        if keep_count >= length:
+            results[i] = texts[i]
+            continue
+        input_ids = encoded.input_ids[row, :length]
+        scores = torch.cat([surprisal.new_zeros(1), surprisal[row, :length - 1]])
+        
+        head = min(n_head, keep_count // 2)
+        tail = min(n_tail, keep_count - head)
+        middle = torch.arange(head, length - tail)
+        top = middle[scores[middle].topk(keep_count - head - tail).indices]
+        selected = torch.cat([torch.arange(head), top.sort().values, torch.arange(length - tail, length)])
+        results[i] = tokenizer.decode(input_ids[selected])
+    return results
+
+def compress_prompts(texts: List[str], target_ratio: float) -> List[str]:
+    """Compress with the method chosen by COMPRESSION_METHOD."""
+    if COMPRESSION_METHOD == "surprisal":
+        return surprisal_compress_batch(texts, target_ratio)
+    return [simple_text_compression(text, target_ratio) for text in texts]
 
-def call_openai_api(prompt: str, client) -> str:
-    """Call OpenAI API with the given prompt."""
+@lru_cache(maxsize=1)
+def get_encoding() -> tiktoken.Encoding:
+    """Tokenizer matching the chat model, so compression ratios reflect billed tokens."""
     try:
-        response = client.responses.create(
-            model=os.getenv("OPENAI_MODEL_CHAT", "gpt-5"),
-            reasoning={"effort": os.getenv("OPENAI_REASONING_EFFORT", "low")},
-            input=[{"role": "user", "content": prompt}],
-        )
-        return getattr(response, "output_text", "") or ""
-    except Exception as e:
-        return f"Error calling OpenAI API: {e}"
+        return tiktoken.encoding_for_model(os.getenv("OPENAI_MODEL_CHAT", "gpt-5"))
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+@lru_cache(maxsize=1024)
+def count_tokens(text: str) -> int:
+    """Count tokens once per distinct text."""
+    return len(get_encoding().encode(text))
 
-def run_simple_test():
+async def run_simple_test():
     """Run a simple compression test."""
-    print("=" * 80)
-    print("Simple LLMLingua-style Prompt Compression Test")
-    print("=" * 80)
-    print(f"Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print()
+    logger.info("=" * 80)
+    logger.info("Simple LLMLingua-style Prompt Compression Test")
+    logger.info("=" * 80)
+    started_at = datetime.now()
+    start = time.perf_counter()
+    logger.info(f"Test started at: {started_at.strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info("")
     
     # Initialize OpenAI client
-    print("Initializing OpenAI client...")
+    logger.info("Initializing OpenAI client...")
     try:
-        client = get_openai_client()
-        print("✓ OpenAI client initialized successfully")
+        client = get_async_openai_client()
+        logger.info("✓ OpenAI client initialized successfully")
     except Exception as e:
-        print(f"✗ Failed to initialize OpenAI client: {e}")
+        logger.error(f"✗ Failed to initialize OpenAI client: {e}")
         return
     
-    print()
+    logger.info("")
     
     # Get test prompts
-    test_prompts = create_test_prompts()
-    results = []
+    test_prompts = TEST_PROMPTS
+    cases = []
     
-    for i, test_case in enumerate(test_prompts, 1):
-        print(f"Test Case {i}: {test_case['name']}")
-        print("-" * 60)
-        
-        original_prompt = test_case['prompt'].strip()
-        print(f"Original prompt length: {len(original_prompt)} characters")
+    # Simulate compression for every prompt at once (one batched pass for the surprisal scorer)
+    logger.info("Simulating prompt compression...")
+    original_prompts = [test_case['prompt'] for test_case in test_prompts]
+    compressed_prompts = compress_prompts(original_prompts, target_ratio=0.4)
+    logger.info("")
+    
+    for i, (test_case, original_prompt, compressed_prompt) in enumerate(
+        zip(test_prompts, original_prompts, compressed_prompts), 1
+    ):
+        logger.info(f"Test Case {i}: {test_case['name']}")
+        logger.info("-" * 60)
         
-        # Simulate compression
-        print("Simulating prompt compression...")
-        compressed_prompt = simple_text_compression(original_prompt, target_ratio=0.4)
+        logger.info(f"Original prompt length: {len(original_prompt)} characters")
         
-        original_tokens = len(original_prompt.split())  # Rough token count
-        compressed_tokens = len(compressed_prompt.split())
-        ratio = f"{original_tokens / compressed_tokens:.1f}x" if compressed_tokens > 0 else "N/A"
+        original_tokens = count_tokens(original_prompt)
+        compressed_tokens = count_tokens(compressed_prompt)
+        ratio = original_tokens / compressed_tokens if compressed_tokens > 0 else None
         
-        print(f"✓ Compression simulated!")
-        print(f"  Original tokens (approx): {original_tokens}")
-        print(f"  Compressed tokens (approx): {compressed_tokens}")
-        print(f"  Compression ratio: {ratio}")
-        print()
+        logger.info(f"✓ Compression simulated!")
+        logger.info(f"  Original tokens: {original_tokens}")
+        logger.info(f"  Compressed tokens: {compressed_tokens}")
+        logger.info(f"  Compression ratio: {f'{ratio:.1f}x' if ratio is not None else 'N/A'}")
+        logger.info("")
         
         # Display prompts
-        print("ORIGINAL PROMPT:")
-        print("-" * 40)
-        print(original_prompt[:500] + "..." if len(original_prompt) > 500 else original_prompt)
-        print()
-        
-        print("COMPRESSED PROMPT:")
-        print("-" * 40)
-        print(compressed_prompt[:500] + "..." if len(compressed_prompt) > 500 else compressed_prompt)
-        print()
+        logger.debug("ORIGINAL PROMPT:")
+        logger.debug("-" * 40)
+        logger.debug(truncate(original_prompt))
+        logger.debug("")
         
-        # Call OpenAI API with both prompts
-        print("Calling OpenAI API with original prompt...")
-        original_response = call_openai_api(original_prompt, client)
-        print("✓ Original prompt response received")
+        logger.debug("COMPRESSED PROMPT:")
+        logger.debug("-" * 40)
+        logger.debug(truncate(compressed_prompt))
+        logger.debug("")
+        logger.debug("=" * 80)
+        logger.debug("")
         
-        print("Calling OpenAI API with compressed prompt...")
-        compressed_response = call_openai_api(compressed_prompt, client)
-        print("✓ Compressed prompt response received")
-        print()
-        
-        # Display responses
-        print("ORIGINAL PROMPT RESPONSE:")
-        print("-" * 40)
-        print(original_response[:300] + "..." if len(original_response) > 300 else original_response)
-        print()
-        
-        print("COMPRESSED PROMPT RESPONSE:")
-        print("-" * 40)
-        print(compressed_response[:300] + "..." if len(compressed_response) > 300 else compressed_response)
-        print()
-        
-        # Store results
-        test_result = {
+        cases.append({
             "test_case": test_case['name'],
             "original_prompt": original_prompt,
             "compressed_prompt": compressed_prompt,
@@ -185,43 +204,80 @@ def run_simple_test():
                 "compressed_tokens": compressed_tokens,
                 "ratio": ratio
             },
-            "original_response": original_response,
-            "compressed_response": compressed_response,
-            "timestamp": datetime.now().isoformat()
-        }
-        results.append(test_result)
-        
-        print("=" * 80)
-        print()
+        })
     
-    # Save results to file
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    results_file = f"simple_compression_test_results_{timestamp}.json"
+    # Call OpenAI API for every test case at once; each result is written to JSONL as soon as
+    # both of its responses arrive, so an interrupted run keeps the cases that already finished
+    timestamp = started_at.strftime("%Y%m%d_%H%M%S")
+    results_file = Path(f"simple_compression_test_results_{timestamp}.jsonl")
+    result_count = 0
+    ratio_sum = 0.0
+    ratio_n = 0
     
-    try:
-        with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        print(f"✓ Results saved to: {results_file}")
-    except Exception as e:
-        print(f"✗ Failed to save results: {e}")
+    api_start = time.perf_counter()
+    pairs = [(case["original_prompt"], case["compressed_prompt"]) for case in cases]
+    
+    with results_file.open('wb') as results_out:
+        async for i, original_response, compressed_response in stream_pair_responses(client, pairs):
+            case = cases[i]
+            logger.debug(f"Test Case {i + 1}: {case['test_case']}")
+            logger.debug("-" * 60)
+            
+            # Display responses
+            logger.debug("ORIGINAL PROMPT RESPONSE:")
+            logger.debug("-" * 40)
+            logger.debug(truncate(original_response, 300))
+            logger.debug("")
+            
+            logger.debug("COMPRESSED PROMPT RESPONSE:")
+            logger.debug("-" * 40)
+            logger.debug(truncate(compressed_response, 300))
+            logger.debug("")
+            
+            # Store results
+            test_result = {
+                **case,
+                "original_response": original_response,
+                "compressed_response": compressed_response,
+                "timestamp": datetime.now().isoformat()
+            }
+            results_out.write(orjson.dumps(test_result) + b"\n")
+            results_out.flush()
+            result_count += 1
+            ratio = case["compression_stats"]["ratio"]
+            if ratio is not None:
+                ratio_sum += ratio
+                ratio_n += 1
+            
+            logger.debug("=" * 80)
+            logger.debug("")
+    
+    logger.info(f"✓ All responses received ({time.perf_counter() - api_start:.1f}s)")
+    logger.info(f"✓ Results saved to: {results_file}")
     
     # Summary
-    print("\n" + "=" * 80)
-    print("TEST SUMMARY")
-    print("=" * 80)
-    print(f"Total test cases: {len(results)}")
-    print(f"Test completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    if results:
-        avg_compression_ratio = sum(
-            float(r['compression_stats']['ratio'].replace('x', '')) 
-            for r in results 
-            if r['compression_stats']['ratio'] != 'N/A'
-        ) / len(results)
-        print(f"Average compression ratio: {avg_compression_ratio:.1f}x")
-    
-    print("=" * 80)
+    logger.info("\n" + "=" * 80)
+    logger.info("TEST SUMMARY")
+    logger.info("=" * 80)
+    logger.info(f"Total test cases: {result_count}")
+    logger.info(f"Test completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info(f"Total time: {time.perf_counter() - start:.1f}s")
+    
+    avg_ratio = ratio_sum / ratio_n if ratio_n else 0
+    if ratio_n:
+        logger.info(f"Average compression ratio: {avg_ratio:.1f}x")
+    
+    logger.info("=" * 80)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--verbose", action="store_true", help="log full prompts and responses for each test case")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    run_simple_test()
+    args = parse_args()
+    # Third-party libraries stay at WARNING; only this script's logger is raised
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+    asyncio.run(run_simple_test())
 
@@ -4,262 +4,164 @@ Test script for LLMLingua prompt compression.
 Compares original vs compressed prompts using OpenAI GPT-4.
 """
 
+import argparse
+import asyncio
+import logging
 import os
-import json
+import time
 from datetime import datetime
-from typing import Dict, Any, List
+from pathlib import Path
+from typing import Dict, Any
+import orjson
+import torch
 from dotenv import load_dotenv
 from llmlingua import PromptCompressor
-from services.openai_client import get_openai_client
+from services.compression_harness import stream_pair_responses, truncate
+from services.openai_client import get_async_openai_client
+from tests.prompts import TEST_PROMPTS
 
 # Load environment variables
 load_dotenv()
 
-def create_test_prompts() -> List[Dict[str, str]]:
-    """Create a set of test prompts for compression testing."""
-    return [
-        {
-            "name": "Long Technical Documentation",
-            "prompt": """
-            Artificial Intelligence (AI) has revolutionized numerous industries and continues to shape the future of technology. 
-            Machine learning algorithms, particularly deep learning neural networks, have enabled breakthroughs in computer vision, 
-            natural language processing, and autonomous systems. These systems require massive amounts of data for training, 
-            sophisticated computational resources, and careful tuning of hyperparameters to achieve optimal performance.
-            
-            The development of transformer architectures has been particularly influential, leading to models like GPT, BERT, 
-            and their successors that can understand and generate human-like text. These models have applications in chatbots, 
-            content generation, translation services, and code assistance tools.
-            
-            However, AI systems also face challenges including bias in training data, interpretability of decisions, 
-            computational costs, and ethical considerations around automation and job displacement. Researchers are actively 
-            working on solutions such as federated learning, explainable AI, and responsible AI frameworks.
-            
-            The future of AI likely involves more efficient models, better integration with human workflows, and continued 
-            advances in areas like reinforcement learning, multimodal AI, and artificial general intelligence research.
-            """
-        },
-        {
-            "name": "Meeting Transcript",
-            "prompt": """
-            Meeting Transcript - Product Planning Session
-            Date: December 15, 2024
-            Participants: Sarah (Product Manager), Mike (Engineering Lead), Lisa (Design Lead), Tom (Marketing)
-            
-            Sarah: Good morning everyone. Thanks for joining today's product planning session. We need to discuss the Q1 roadmap 
-            and prioritize features for our mobile app. Mike, can you give us an update on the current development status?
-            
-            Mike: Sure. We've completed the user authentication system and the core navigation framework. The team is currently 
-            working on the payment integration module. We're about 60% complete with that. The main challenge we're facing is 
-            integrating with multiple payment providers while maintaining security standards.
-            
-            Lisa: From a design perspective, we've finalized the wireframes for the main user flows. The design system is 
-            consistent across all screens. We're now focusing on micro-interactions and accessibility features. I'd like to 
-            propose adding haptic feedback for better user experience.
-            
-            Tom: Marketing has been conducting user research and we've identified three key user personas. The primary persona 
-            is millennials aged 25-35 who value convenience and speed. Our secondary persona is small business owners who need 
-            efficient transaction management. We should prioritize features that serve both groups.
-            
-            Sarah: That's helpful context. Based on your inputs, I propose we focus on three key features for Q1: 
-            1) Enhanced payment processing with multiple provider support, 2) Advanced analytics dashboard for business users, 
-            and 3) Push notification system for real-time updates. Mike, what's your timeline estimate for these features?
-            
-            Mike: Payment processing enhancement should take about 4 weeks. The analytics dashboard will require 6 weeks 
-            including backend infrastructure. Push notifications can be implemented in 3 weeks. We'll need additional 
-            QA resources for testing across different devices and platforms.
-            
-            Lisa: I agree with the timeline. For the analytics dashboard, we'll need to design data visualization components 
-            that are both informative and intuitive. We should also consider mobile responsiveness for the dashboard.
-            
-            Tom: Marketing can support with user testing for each feature. We'll also need to prepare launch materials and 
-            coordinate with our PR team for announcements. I suggest we do a soft launch for each feature with a subset of users.
-            
-            Sarah: Excellent. Let's finalize the timeline and resource allocation. I'll send out a detailed project plan by 
-            end of week. Any other concerns or suggestions before we wrap up?
-            
-            Mike: One thing - we should consider the impact on our current users during the rollout. We might need feature flags 
-            to gradually enable new functionality.
-            
-            Lisa: Good point. We'll design the features to be backward compatible and provide clear migration paths for existing users.
-            
-            Sarah: Perfect. Meeting adjourned. Thanks everyone for the productive discussion.
-            """
-        },
-        {
-            "name": "Code Review Discussion",
-            "prompt": """
-            Code Review Discussion - Pull Request #1234
-            Repository: company/web-application
-            Author: Developer John Smith
-            Reviewers: Senior Developer Alice, Tech Lead Bob, QA Engineer Carol
-            
-            Alice: I've reviewed the authentication middleware changes. Overall, the implementation looks solid. However, I have 
-            a few concerns about the error handling in the token validation function. The current implementation throws generic 
-            exceptions that don't provide enough context for debugging.
-            
-            Bob: I agree with Alice's point about error handling. Also, I noticed that the JWT token expiration logic doesn't 
-            account for clock skew between servers. This could cause issues in distributed environments. We should implement 
-            a grace period for token validation.
-            
-            Carol: From a testing perspective, I've run the unit tests and they all pass. However, I'd like to see more 
-            integration tests covering edge cases like malformed tokens, expired tokens, and concurrent requests. The current 
-            test coverage is around 85% but we should aim for 90%+ for security-critical components.
-            
-            John: Thanks for the feedback. I'll address the error handling by creating specific exception types with detailed 
-            error messages. For the clock skew issue, I'll implement a configurable grace period (default 5 minutes) for token 
-            validation. I'll also add integration tests for the edge cases Carol mentioned.
-            
-            Alice: That sounds good. One more thing - I noticed the logging statements use different log levels inconsistently. 
-            Security-related events should always use WARNING or ERROR level, not INFO. This is important for compliance 
-            with our security audit requirements.
-            
-            Bob: Good catch, Alice. Also, we should add rate limiting to the authentication endpoints to prevent brute force 
-            attacks. The current implementation doesn't have any throttling mechanism.
-            
-            Carol: I'll update the test cases to include rate limiting scenarios. We should test both successful authentication 
-            and failed attempts with various rate limits.
-            
-            John: I'll implement rate limiting using Redis with sliding window algorithm. I'll also standardize the logging 
-            levels as Alice suggested. The changes should be ready for another review by tomorrow.
-            
-            Alice: Perfect. Once you address these points, I'll approve the PR. The overall architecture and code quality 
-            are good, these are just important security and reliability improvements.
-            
-            Bob: Agreed. The middleware design is clean and follows our established patterns. With these improvements, 
-            it should be production-ready.
-            
-            Carol: I'll prepare the test environment for final validation once the changes are pushed. Looking forward to 
-            the updated implementation.
-            """
-        }
-    ]
+# Progress and summary go to INFO; full prompts and responses only with --verbose (DEBUG)
+logger = logging.getLogger("compression_test")
 
-def compress_prompt_with_llmlingua(prompt: str, compressor: PromptCompressor) -> Dict[str, Any]:
-    """Compress a prompt using LLMLingua."""
+# Loaded lazily by get_compressor() and reused for the life of the process
+compressor = None
+# Run the compressor model in half precision (bf16 on CPU, fp16 on GPU); set to 0 for fp32
+COMPRESSOR_HALF_PRECISION = os.getenv("LLMLINGUA_HALF_PRECISION", "1") == "1"
+# Compile the compressor model (the first compression pays for compilation, later forwards are faster)
+COMPRESSOR_TORCH_COMPILE = os.getenv("LLMLINGUA_TORCH_COMPILE") == "1"
+
+def half_dtype(device_type: str) -> torch.dtype:
+    return torch.float16 if device_type == "cuda" else torch.bfloat16
+
+def compressor_device_type() -> str:
+    return next(get_compressor().model.parameters()).device.type
+
+def get_compressor() -> PromptCompressor:
+    """Load the LLMLingua compressor once, falling back to the default model."""
+    global compressor
+    if compressor is not None:
+        return compressor
+    
+    torch.set_num_threads(os.cpu_count() or 1)
     try:
-        result = compressor.compress_prompt(
-            prompt, 
-            instruction="", 
-            question="", 
-            target_token=200
-        )
-        return result
+        # Use a CPU-compatible model for testing
+        compressor = PromptCompressor("distilbert-base-uncased")
     except Exception as e:
-        print(f"Error compressing prompt: {e}")
-        return {"error": str(e)}
+        logger.warning(f"✗ Failed to initialize LLMLingua: {e}")
+        # Try with default model as fallback
+        logger.warning("Trying with default model...")
+        compressor = PromptCompressor()
+    if COMPRESSOR_HALF_PRECISION:
+        compressor.model = compressor.model.to(dtype=half_dtype(compressor_device_type()))
+    compressor.model.eval()
+    if COMPRESSOR_TORCH_COMPILE:
+        compile_compressor_model(compressor)
+    return compressor
 
-def call_openai_api(prompt: str, client) -> str:
-    """Call OpenAI API with the given prompt."""
+def compile_compressor_model(compressor: PromptCompressor) -> None:
+    """
+    Swap in a torch.compile'd model.
+    LLMLingua feeds chunks of varying length with a KV cache, so compile for dynamic shapes
+    rather than recompiling per shape; compilation happens lazily on the first compression.
+    """
+    compressor.model = torch.compile(compressor.model, dynamic=True)
+
+def compress_prompt_with_llmlingua(prompt: str) -> Dict[str, Any]:
+    """Compress a prompt using LLMLingua."""
     try:
-        response = client.responses.create(
-            model=os.getenv("OPENAI_MODEL_CHAT", "gpt-5"),
-            reasoning={"effort": os.getenv("OPENAI_REASONING_EFFORT", "low")},
-            input=[{"role": "user", "content": prompt}],
-        )
-        return getattr(response, "output_text", "") or ""
+        device_type = compressor_device_type()
+        with torch.inference_mode(), torch.autocast(
+            device_type, dtype=half_dtype(device_type), enabled=COMPRESSOR_HALF_PRECISION
+        ):
+            result = get_compressor().compress_prompt(
+                prompt, 
+                instruction="", 
+                question="", 
+                target_token=200
+            )
+        return result
     except Exception as e:
-        return f"Error calling OpenAI API: {e}"
+        logger.error(f"Error compressing prompt: {e}")
+        return {"error": str(e)}
 
-def run_comparison_test():
+async def run_comparison_test():
     """Run the main comparison test."""
-    print("=" * 80)
-    print("LLMLingua Prompt Compression Test")
-    print("=" * 80)
-    print(f"Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print()
+    logger.info("=" * 80)
+    logger.info("LLMLingua Prompt Compression Test")
+    logger.info("=" * 80)
+    started_at = datetime.now()
+    start = time.perf_counter()
+    logger.info(f"Test started at: {started_at.strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info("")
     
     # Initialize LLMLingua compressor with CPU-compatible model
-    print("Initializing LLMLingua compressor...")
+    logger.info("Initializing LLMLingua compressor...")
     try:
-        # Use a CPU-compatible model for testing
-        compressor = PromptCompressor("distilbert-base-uncased")
-        print("✓ LLMLingua compressor initialized successfully")
+        get_compressor()
+        logger.info("✓ LLMLingua compressor initialized successfully")
     except Exception as e:
-        print(f"✗ Failed to initialize LLMLingua: {e}")
-        # Try with default model as fallback
-        try:
-            print("Trying with default model...")
-            compressor = PromptCompressor()
-            print("✓ LLMLingua compressor initialized successfully with default model")
-        except Exception as e2:
-            print(f"✗ Failed to initialize LLMLingua with default model: {e2}")
-            return
+        logger.error(f"✗ Failed to initialize LLMLingua with default model: {e}")
+        return
     
     # Initialize OpenAI client
-    print("Initializing OpenAI client...")
+    logger.info("Initializing OpenAI client...")
     try:
-        client = get_openai_client()
-        print("✓ OpenAI client initialized successfully")
+        client = get_async_openai_client()
+        logger.info("✓ OpenAI client initialized successfully")
     except Exception as e:
-        print(f"✗ Failed to initialize OpenAI client: {e}")
+        logger.error(f"✗ Failed to initialize OpenAI client: {e}")
         return
     
-    print()
+    logger.info("")
     
     # Get test prompts
-    test_prompts = create_test_prompts()
-    results = []
+    test_prompts = TEST_PROMPTS
+    cases = []
     
     for i, test_case in enumerate(test_prompts, 1):
-        print(f"Test Case {i}: {test_case['name']}")
-        print("-" * 60)
+        logger.info(f"Test Case {i}: {test_case['name']}")
+        logger.info("-" * 60)
         
-        original_prompt = test_case['prompt'].strip()
-        print(f"Original prompt length: {len(original_prompt)} characters")
+        original_prompt = test_case['prompt']
+        logger.info(f"Original prompt length: {len(original_prompt)} characters")
         
         # Compress the prompt
-        print("Compressing prompt with LLMLingua...")
-        compression_result = compress_prompt_with_llmlingua(original_prompt, compressor)
+        logger.info("Compressing prompt with LLMLingua...")
+        compression_result = compress_prompt_with_llmlingua(original_prompt)
         
         if "error" in compression_result:
-            print(f"✗ Compression failed: {compression_result['error']}")
+            logger.error(f"✗ Compression failed: {compression_result['error']}")
             continue
         
         compressed_prompt = compression_result.get('compressed_prompt', '')
         original_tokens = compression_result.get('origin_tokens', 0)
         compressed_tokens = compression_result.get('compressed_tokens', 0)
-        ratio = compression_result.get('ratio', 'N/A')
+        # Derive the ratio from the token counts rather than parsing LLMLingua's "3.2x" string
+        ratio = original_tokens / compressed_tokens if compressed_tokens > 0 else None
         
-        print(f"✓ Compression successful!")
-        print(f"  Original tokens: {original_tokens}")
-        print(f"  Compressed tokens: {compressed_tokens}")
-        print(f"  Compression ratio: {ratio}")
-        print()
+        logger.info(f"✓ Compression successful!")
+        logger.info(f"  Original tokens: {original_tokens}")
+        logger.info(f"  Compressed tokens: {compressed_tokens}")
+        logger.info(f"  Compression ratio: {f'{ratio:.1f}x' if ratio is not None else 'N/A'}")
+        logger.info("")
         
         # Display prompts
-        print("ORIGINAL PROMPT:")
-        print("-" * 40)
-        print(original_prompt[:500] + "..." if len(original_prompt) > 500 else original_prompt)
-        print()
-        
-        print("COMPRESSED PROMPT:")
-        print("-" * 40)
-        print(compressed_prompt[:500] + "..." if len(compressed_prompt) > 500 else compressed_prompt)
-        print()
-        
-        # Call OpenAI API with both prompts
-        print("Calling OpenAI API with original prompt...")
-        original_response = call_openai_api(original_prompt, client)
-        print("✓ Original prompt response received")
-        
-        print("Calling OpenAI API with compressed prompt...")
-        compressed_response = call_openai_api(compressed_prompt, client)
-        print("✓ Compressed prompt response received")
-        print()
-        
-        # Display responses
-        print("ORIGINAL PROMPT RESPONSE:")
-        print("-" * 40)
-        print(original_response[:300] + "..." if len(original_response) > 300 else original_response)
-        print()
+        logger.debug("ORIGINAL PROMPT:")
+        logger.debug("-" * 40)
+        logger.debug(truncate(original_prompt))
+        logger.debug("")
         
-        print("COMPRESSED PROMPT RESPONSE:")
-        print("-" * 40)
-        print(compressed_response[:300] + "..." if len(compressed_response) > 300 else compressed_response)
-        print()
+        logger.debug("COMPRESSED PROMPT:")
+        logger.debug("-" * 40)
+        logger.debug(truncate(compressed_prompt))
+        logger.debug("")
+        logger.debug("=" * 80)
+        logger.debug("")
         
-        # Store results
-        test_result = {
+        cases.append({
             "test_case": test_case['name'],
             "original_prompt": original_prompt,
             "compressed_prompt": compressed_prompt,
@@ -268,42 +170,79 @@ def run_comparison_test():
                 "compressed_tokens": compressed_tokens,
                 "ratio": ratio
             },
-            "original_response": original_response,
-            "compressed_response": compressed_response,
-            "timestamp": datetime.now().isoformat()
-        }
-        results.append(test_result)
-        
-        print("=" * 80)
-        print()
+        })
     
-    # Save results to file
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    results_file = f"llmlingua_test_results_{timestamp}.json"
+    # Call OpenAI API for every test case at once; each result is written to JSONL as soon as
+    # both of its responses arrive, so an interrupted run keeps the cases that already finished
+    timestamp = started_at.strftime("%Y%m%d_%H%M%S")
+    results_file = Path(f"llmlingua_test_results_{timestamp}.jsonl")
+    result_count = 0
+    ratio_sum = 0.0
+    ratio_n = 0
     
-    try:
-        with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        print(f"✓ Results saved to: {results_file}")
-    except Exception as e:
-        print(f"✗ Failed to save results: {e}")
+    api_start = time.perf_counter()
+    pairs = [(case["original_prompt"], case["compressed_prompt"]) for case in cases]
+    
+    with results_file.open('wb') as results_out:
+        async for i, original_response, compressed_response in stream_pair_responses(client, pairs):
+            case = cases[i]
+            logger.debug(f"Test Case {i + 1}: {case['test_case']}")
+            logger.debug("-" * 60)
+            
+            # Display responses
+            logger.debug("ORIGINAL PROMPT RESPONSE:")
+            logger.debug("-" * 40)
+            logger.debug(truncate(original_response, 300))
+            logger.debug("")
+            
+            logger.debug("COMPRESSED PROMPT RESPONSE:")
+            logger.debug("-" * 40)
+            logger.debug(truncate(compressed_response, 300))
+            logger.debug("")
+            
+            # Store results
+            test_result = {
+                **case,
+                "original_response": original_response,
+                "compressed_response": compressed_response,
+                "timestamp": datetime.now().isoformat()
+            }
+            results_out.write(orjson.dumps(test_result) + b"\n")
+            results_out.flush()
+            result_count += 1
+            ratio = case["compression_stats"]["ratio"]
+            if ratio is not None:
+                ratio_sum += ratio
+                ratio_n += 1
+            
+            logger.debug("=" * 80)
+            logger.debug("")
+    
+    logger.info(f"✓ All responses received ({time.perf_counter() - api_start:.1f}s)")
+    logger.info(f"✓ Results saved to: {results_file}")
     
     # Summary
-    print("\n" + "=" * 80)
-    print("TEST SUMMARY")
-    print("=" * 80)
-    print(f"Total test cases: {len(results)}")
-    print(f"Test completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info("\n" + "=" * 80)
+    logger.info("TEST SUMMARY")
+    logger.info("=" * 80)
+    logger.info(f"Total test cases: {result_count}")
+    logger.info(f"Test completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info(f"Total time: {time.perf_counter() - start:.1f}s")
     
-    if results:
-        avg_compression_ratio = sum(
-            float(r['compression_stats']['ratio'].replace('x', '')) 
-            for r in results 
-            if r['compression_stats']['ratio'] != 'N/A'
-        ) / len(results)
-        print(f"Average compression ratio: {avg_compression_ratio:.1f}x")
+    avg_ratio = ratio_sum / ratio_n if ratio_n else 0
+    if ratio_n:
+        logger.info(f"Average compression ratio: {avg_ratio:.1f}x")
     
-    print("=" * 80)
+    logger.info("=" * 80)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--verbose", action="store_true", help="log full prompts and responses for each test case")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    run_comparison_test()
+    args = parse_args()
+    # Third-party libraries stay at WARNING; only this script's logger is raised
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+    asyncio.run(run_comparison_test())
@@ -0,0 +1,128 @@
+"""
+Canonical prompts shared by the compression test scripts.
+Both scripts send byte-identical prompts, so they share the on-disk response cache.
+"""
+
+import textwrap
+from typing import Dict, Tuple
+
+def _test_prompt(name: str, raw: str) -> Dict[str, str]:
+    """Normalize a prompt once at import so every caller sees the same text."""
+    return {"name": name, "prompt": textwrap.dedent(raw).strip()}
+
+TEST_PROMPTS: Tuple[Dict[str, str], ...] = (
+    _test_prompt(
+        "Long Technical Documentation",
+        """
+            Artificial Intelligence (AI) has revolutionized numerous industries and continues to shape the future of technology. 
+            Machine learning algorithms, particularly deep learning neural networks, have enabled breakthroughs in computer vision, 
+            natural language processing, and autonomous systems. These systems require massive amounts of data for training, 
+            sophisticated computational resources, and careful tuning of hyperparameters to achieve optimal performance.
+            
+            The development of transformer architectures has been particularly influential, leading to models like GPT, BERT, 
+            and their successors that can understand and generate human-like text. These models have applications in chatbots, 
+            content generation, translation services, and code assistance tools.
+            
+            However, AI systems also face challenges including bias in training data, interpretability of decisions, 
+            computational costs, and ethical considerations around automation and job displacement. Researchers are actively 
+            working on solutions such as federated learning, explainable AI, and responsible AI frameworks.
+            
+            The future of AI likely involves more efficient models, better integration with human workflows, and continued 
+            advances in areas like reinforcement learning, multimodal AI, and artificial general intelligence research.
+            """
+    ),
+    _test_prompt(
+        "Meeting Transcript",
+        """
+            Meeting Transcript - Product Planning Session
+            Date: December 15, 2024
+            Participants: Sarah (Product Manager), Mike (Engineering Lead), Lisa (Design Lead), Tom (Marketing)
+            
+            Sarah: Good morning everyone. Thanks for joining today's product planning session. We need to discuss the Q1 roadmap 
+            and prioritize features for our mobile app. Mike, can you give us an update on the current development status?
+            
+            Mike: Sure. We've completed the user authentication system and the core navigation framework. The team is currently 
+            working on the payment integration module. We're about 60% complete with that. The main challenge we're facing is 
+            integrating with multiple payment providers while maintaining security standards.
+            
+            Lisa: From a design perspective, we've finalized the wireframes for the main user flows. The design system is 
+            consistent across all screens. We're now focusing on micro-interactions and accessibility features. I'd like to 
+            propose adding haptic feedback for better user experience.
+            
+            Tom: Marketing has been conducting user research and we've identified three key user personas. The primary persona 
+            is millennials aged 25-35 who value convenience and speed. Our secondary persona is small business owners who need 
+            efficient transaction management. We should prioritize features that serve both groups.
+            
+            Sarah: That's helpful context. Based on your inputs, I propose we focus on three key features for Q1: 
+            1) Enhanced payment processing with multiple provider support, 2) Advanced analytics dashboard for business users, 
+            and 3) Push notification system for real-time updates. Mike, what's your timeline estimate for these features?
+            
+            Mike: Payment processing enhancement should take about 4 weeks. The analytics dashboard will require 6 weeks 
+            including backend infrastructure. Push notifications can be implemented in 3 weeks. We'll need additional 
+            QA resources for testing across different devices and platforms.
+            
+            Lisa: I agree with the timeline. For the analytics dashboard, we'll need to design data visualization components 
+            that are both informative and intuitive. We should also consider mobile responsiveness for the dashboard.
+            
+            Tom: Marketing can support with user testing for each feature. We'll also need to prepare launch materials and 
+            coordinate with our PR team for announcements. I suggest we do a soft launch for each feature with a subset of users.
+            
+            Sarah: Excellent. Let's finalize the timeline and resource allocation. I'll send out a detailed project plan by 
+            end of week. Any other concerns or suggestions before we wrap up?
+            
+            Mike: One thing - we should consider the impact on our current users during the rollout. We might need feature flags 
+            to gradually enable new functionality.
+            
+            Lisa: Good point. We'll design the features to be backward compatible and provide clear migration paths for existing users.
+            
+            Sarah: Perfect. Meeting adjourned. Thanks everyone for the productive discussion.
+            """
+    ),
+    _test_prompt(
+        "Code Review Discussion",
+        """
+            Code Review Discussion - Pull Request #1234
+            Repository: company/web-application
+            Author: Developer John Smith
+            Reviewers: Senior Developer Alice, Tech Lead Bob, QA Engineer Carol
+            
+            Alice: I've reviewed the authentication middleware changes. Overall, the implementation looks solid. However, I have 
+            a few concerns about the error handling in the token validation function. The current implementation throws generic 
+            exceptions that don't provide enough context for debugging.
+            
+            Bob: I agree with Alice's point about error handling. Also, I noticed that the JWT token expiration logic doesn't 
+            account for clock skew between servers. This could cause issues in distributed environments. We should implement 
+            a grace period for token validation.
+            
+            Carol: From a testing perspective, I've run the unit tests and they all pass. However, I'd like to see more 
+            integration tests covering edge cases like malformed tokens, expired tokens, and concurrent requests. The current 
+            test coverage is around 85% but we should aim for 90%+ for security-critical components.
+            
+            John: Thanks for the feedback. I'll address the error handling by creating specific exception types with detailed 
+            error messages. For the clock skew issue, I'll implement a configurable grace period (default 5 minutes) for token 
+            validation. I'll also add integration tests for the edge cases Carol mentioned.
+            
+            Alice: That sounds good. One more thing - I noticed the logging statements use different log levels inconsistently. 
+            Security-related events should always use WARNING or ERROR level, not INFO. This is important for compliance 
+            with our security audit requirements.
+            
+            Bob: Good catch, Alice. Also, we should add rate limiting to the authentication endpoints to prevent brute force 
+            attacks. The current implementation doesn't have any throttling mechanism.
+            
+            Carol: I'll update the test cases to include rate limiting scenarios. We should test both successful authentication 
+            and failed attempts with various rate limits.
+            
+            John: I'll implement rate limiting using Redis with sliding window algorithm. I'll also standardize the logging 
+            levels as Alice suggested. The changes should be ready for another review by tomorrow.
+            
+            Alice: Perfect. Once you address these points, I'll approve the PR. The overall architecture and code quality 
+            are good, these are just important security and reliability improvements.
+            
+            Bob: Agreed. The middleware design is clean and follows our established patterns. With these improvements, 
+            it should be production-ready.
+            
+            Carol: I'll prepare the test environment for final validation once the changes are pushed. Looking forward to 
+            the updated implementation.
+            """
+    ),
+)